@@ -0,0 +1,72 @@
+import hashlib
+import re
+import threading
+
+# CONFIGURATION
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+SHINGLE_SIZE = 3
+# Pages whose SimHashes differ in at most this many bits are treated as the same page.
+NEAR_DUPLICATE_DISTANCE = 3
+# Short pages share too many shingles by chance, so they are only collapsed on an exact match.
+NEAR_DUPLICATE_MIN_WORDS = 50
+WORD_RE = re.compile(r"\w+")
+
+
+def simhash(words: list) -> int:
+    shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))]
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=SIMHASH_BITS // 8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if weights[bit] > 0)
+
+
+def content_fingerprint(text: str) -> tuple:
+    """
+    Returns (exact_hash, simhash, word_count) for a page's main text. The exact hash is
+    taken over the normalized word sequence, so whitespace and punctuation changes do not
+    break it. Runs in the parse process pool alongside the page rewrite.
+    """
+    words = WORD_RE.findall(text.lower())
+    exact_hash = hashlib.sha256(" ".join(words).encode('utf-8')).hexdigest()
+    return exact_hash, simhash(words), len(words)
+
+
+class ContentDeduplicator:
+    """
+    Tracks the fingerprints of pages saved during one crawl. check() registers a page as
+    canonical, or returns the URL of the page it duplicates. Near-duplicates are found through
+    SimHash bands: with at most NEAR_DUPLICATE_DISTANCE differing bits, at least one
+    of SIMHASH_BANDS bands must match exactly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._bands = {}
+        self.aliases = {}
+
+    def _band_keys(self, value: int) -> list:
+        width = SIMHASH_BITS // SIMHASH_BANDS
+        return [(band, value >> (band * width) & ((1 << width) - 1)) for band in range(SIMHASH_BANDS)]
+
+    def check(self, url: str, fingerprint: tuple) -> str | None:
+        exact_hash, value, word_count = fingerprint
+        if not word_count: return None
+        near = word_count >= NEAR_DUPLICATE_MIN_WORDS
+        with self._lock:
+            canonical = self._exact.get(exact_hash)
+            if canonical is None and near:
+                candidates = (entry for key in self._band_keys(value) for entry in self._bands.get(key, ()))
+                canonical = next((other_url for other_value, other_url in candidates if bin(value ^ other_value).count("1") <= NEAR_DUPLICATE_DISTANCE), None)
+            if canonical is not None:
+                self.aliases[url] = canonical
+                return canonical
+
+            self._exact[exact_hash] = url
+            if near:
+                for key in self._band_keys(value):
+                    self._bands.setdefault(key, []).append((value, url))
+            return None
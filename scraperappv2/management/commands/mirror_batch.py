@@ -0,0 +1,131 @@
+import json
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scraperappv2.scraper import (
+    run_scrape_workflow, run_tailwind_conversion, run_react_conversion_workflow, create_parse_pool,
+    AI_CHUNK_TOKEN_BUDGET, DEFAULT_MAX_DEPTH, DEFAULT_USER_AGENT, DEFAULT_PARSE_WORKERS,
+)
+from scraperappv2.storage import get_scrape_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Mirrors many sites in parallel. Reads one URL per line from a file (or stdin) and "
+        "writes one JSON result record per site to stdout as each site finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", nargs="?", default="-", help="File with one URL per line, or '-' for stdin (default).")
+        parser.add_argument("--sites", type=int, default=4, help="Number of sites mirrored at the same time (at most --workers).")
+        parser.add_argument("--workers", type=int, default=32, help="Total fetch threads shared by all running sites.")
+        parser.add_argument("--per-host", type=int, default=1, help="Maximum number of sites from the same host mirrored at once.")
+        parser.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS, help="Size of the parse process pool shared by all sites.")
+        parser.add_argument("--depth", type=int, default=DEFAULT_MAX_DEPTH)
+        parser.add_argument("--user-agent", default=DEFAULT_USER_AGENT)
+        parser.add_argument("--tailwind", action="store_true", help="Also run the Tailwind conversion for each site.")
+        parser.add_argument("--react", action="store_true", help="Also run the React conversion for each site.")
+        parser.add_argument("--output", help="Write JSON-lines records to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        for option in ("sites", "workers", "per_host", "parse_workers"):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1.")
+
+        urls = self.read_urls(options["source"])
+        if not urls:
+            raise CommandError("No URLs to mirror.")
+
+        # Every running site needs at least one fetch thread of the --workers budget.
+        sites = min(options["sites"], options["workers"], len(urls))
+        out = open(options["output"], "a", encoding="utf-8") if options["output"] else self.stdout
+
+        try:
+            with create_parse_pool(options["parse_workers"]) as parse_pool, ThreadPoolExecutor(max_workers=sites) as executor:
+                pending, running, active_hosts = deque(urls), {}, Counter()
+                while pending or running:
+                    while len(running) < sites:
+                        startable = self.startable_urls(pending, active_hosts, options["per_host"])
+                        if not startable: break
+                        # The budget is shared by the sites that can actually run now, so a list that the per-host
+                        # limit keeps to one site at a time still uses every worker.
+                        free = options["workers"] - sum(share for _, share in running.values())
+                        share = min(free, options["workers"] // min(sites, len(running) + len(startable)))
+                        if share < 1: break
+                        url = startable[0]
+                        pending.remove(url)
+                        active_hosts[urlparse(url).netloc] += 1
+                        running[executor.submit(self.mirror_site, url, share, parse_pool, options)] = (url, share)
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url, _ = running.pop(future)
+                        active_hosts[urlparse(url).netloc] -= 1
+                        out.write(json.dumps(future.result()) + "\n")
+                        out.flush()
+        finally:
+            if out is not self.stdout: out.close()
+
+    def startable_urls(self, pending: deque, active_hosts: Counter, per_host: int) -> list:
+        """Pending URLs, in order, that could all start now without going over the per-host limit."""
+        slots, urls = Counter(active_hosts), []
+        for url in pending:
+            host = urlparse(url).netloc
+            if slots[host] < per_host:
+                slots[host] += 1
+                urls.append(url)
+        return urls
+
+    def read_urls(self, source: str) -> list:
+        if source == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            try:
+                with open(source, encoding="utf-8") as f: lines = f.read().splitlines()
+            except OSError as e:
+                raise CommandError(f"Cannot read URL list: {e}")
+        urls = [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+        return list(dict.fromkeys(urls))
+
+    def mirror_site(self, url: str, workers: int, parse_pool: ProcessPoolExecutor, options: dict) -> dict:
+        started = time.monotonic()
+        record, timings = {"url": url, "status": "ok"}, {}
+        if not url.startswith(('http://', 'https://')):
+            return {**record, "status": "error", "error": "URL must start with http:// or https://", "timings": timings}
+
+        try:
+            storage = get_scrape_storage()
+            metrics = {}
+            file_list, zip_path = run_scrape_workflow(
+                url, depth=options["depth"], workers=workers, user_agent=options["user_agent"],
+                storage=storage, parse_pool=parse_pool, metrics=metrics,
+            )
+            timings.update(metrics.pop("timings"))
+            record.update(metrics, archive=zip_path)
+
+            scrape_dir = str(storage.scrape_dir(metrics["scrape_id"]))
+            if not file_list:
+                record["status"] = "empty"
+            else:
+                if options["tailwind"]:
+                    step_started = time.monotonic()
+                    record["tailwind_archive"] = run_tailwind_conversion(scrape_dir, storage=storage)
+                    timings["tailwind"] = round(time.monotonic() - step_started, 3)
+                if options["react"]:
+                    step_started = time.monotonic()
+                    record["react_archive"] = run_react_conversion_workflow(
+                        scrape_dir, storage=storage, token_budget=getattr(settings, 'SCRAPER_AI_TOKEN_BUDGET', AI_CHUNK_TOKEN_BUDGET),
+                    )
+                    timings["react"] = round(time.monotonic() - step_started, 3)
+        except Exception as e:
+            record.update(status="error", error=str(e))
+
+        timings["total"] = round(time.monotonic() - started, 3)
+        record["timings"] = timings
+        return record
@@ -0,0 +1,72 @@
+import threading
+from urllib.parse import urlparse
+
+# CONFIGURATION
+RENDER_STATIC = "static"
+RENDER_DYNAMIC = "dynamic"
+RENDER_MODE_MIN_SAMPLES = 3
+# Share of samples that must agree before a pattern is routed without probing.
+RENDER_MODE_AGREEMENT = 0.8
+# Every Nth routed page is probed again (static fetch + sparse check) to re-validate the decision.
+RENDER_MODE_REVALIDATE_EVERY = 20
+PATH_PATTERN_DEPTH = 2
+
+
+def path_pattern(url: str) -> str:
+    """
+    Groups pages by their directory, ignoring the leaf: /blog/2023/post-a -> /blog/*,
+    /products/42 -> /products, /about -> /. Segments containing digits become '*'.
+    """
+    segments = [seg for seg in urlparse(url).path.split('/') if seg][:-1]
+    generalized = ['*' if any(c.isdigit() for c in seg) else seg for seg in segments[:PATH_PATTERN_DEPTH]]
+    return "/" + "/".join(generalized)
+
+
+class RenderModeAdvisor:
+    """
+    Learns, per host and per path pattern, whether pages need a Selenium render.
+    Until a pattern has enough agreeing samples, choose() returns None and the caller
+    probes (static fetch, then Selenium if sparse) and reports the outcome via record().
+    Once decided, pages are routed straight to the right fetcher; patterns without a
+    decision of their own fall back to the host-wide decision.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _keys(self, url: str) -> tuple:
+        host = urlparse(url).netloc
+        return (host, path_pattern(url)), (host, "/**")
+
+    def choose(self, url: str) -> str | None:
+        pattern_key, host_key = self._keys(url)
+        with self._lock:
+            stats = self._stats.get(pattern_key)
+            # A pattern with enough samples but no clear majority keeps probing rather than following the host.
+            if not stats or (not stats["decision"] and stats["static"] + stats["dynamic"] < RENDER_MODE_MIN_SAMPLES):
+                stats = self._stats.get(host_key)
+            if not stats or not stats["decision"]:
+                return None
+            stats["routed"] += 1
+            if stats["routed"] % RENDER_MODE_REVALIDATE_EVERY == 0:
+                return None
+            return stats["decision"]
+
+    def record(self, url: str, needs_js: bool):
+        outcome = RENDER_DYNAMIC if needs_js else RENDER_STATIC
+        with self._lock:
+            for key in self._keys(url):
+                stats = self._stats.setdefault(key, {"static": 0, "dynamic": 0, "routed": 0, "decision": None})
+                if stats["decision"] and stats["decision"] != outcome:
+                    # A re-validation probe disagreed: forget the old samples and learn again.
+                    stats.update({"static": 0, "dynamic": 0, "decision": None})
+                stats[outcome] += 1
+                total = stats["static"] + stats["dynamic"]
+                if total >= RENDER_MODE_MIN_SAMPLES:
+                    majority = max((RENDER_STATIC, RENDER_DYNAMIC), key=lambda mode: stats[mode])
+                    stats["decision"] = majority if stats[majority] / total >= RENDER_MODE_AGREEMENT else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {f"{host}{pattern}": dict(stats) for (host, pattern), stats in sorted(self._stats.items())}
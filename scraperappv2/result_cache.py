@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import time
+import logging
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .storage import RESULT_CACHE_FILENAME, ScrapeStorage, get_scrape_storage
+
+logger = logging.getLogger(__name__)
+
+# CONFIGURATION
+DEFAULT_RESULT_CACHE_TTL = 15 * 60
+
+
+def normalize_url(url: str) -> str:
+    """Lower-cases scheme and host, drops default ports, fragments and trailing slashes, and sorts the query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host += f":{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path.rstrip('/'), query, ''))
+
+
+class ScrapeResultCache:
+    """
+    Remembers recent (file_list, zip_path) scrape results keyed by normalized URL and
+    scrape options. Results are kept in the storage root under file locks, so every
+    server process (e.g. each gunicorn worker) shares them, and concurrent requests for
+    the same key, in any process, wait on the single in-flight scrape.
+    """
+
+    def __init__(self, storage: ScrapeStorage, ttl_seconds: int = DEFAULT_RESULT_CACHE_TTL):
+        self.storage = storage
+        self.ttl_seconds = ttl_seconds
+
+    def make_key(self, url: str, options: dict) -> str:
+        key = [normalize_url(url)] + sorted([name, value] for name, value in options.items())
+        return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()[:32]
+
+    def _path(self) -> Path:
+        return self.storage.root / RESULT_CACHE_FILENAME
+
+    def _load(self) -> dict:
+        try:
+            return json.loads(self._path().read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Result cache is unreadable, starting a new one: {e}")
+            return {}
+
+    def _is_fresh(self, entry: dict, since: float = 0) -> bool:
+        # The storage manager evicts the archive together with the scrape directory.
+        finished_at = entry["finished_at"]
+        return finished_at >= since and time.time() - finished_at < self.ttl_seconds and Path(entry["zip_path"]).is_file()
+
+    def _lookup(self, key: str, since: float) -> dict | None:
+        with self.storage.lock("result_cache"):
+            entry = self._load().get(key)
+        return entry if entry and self._is_fresh(entry, since) else None
+
+    def _store(self, key: str, file_list: list, zip_path: str):
+        with self.storage.lock("result_cache"):
+            entries = {k: e for k, e in self._load().items() if self._is_fresh(e)}
+            entries[key] = {"finished_at": time.time(), "file_list": file_list, "zip_path": zip_path}
+            self.storage.root.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path().with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(entries), encoding='utf-8')
+            os.replace(tmp_path, self._path())
+
+    def get_or_scrape(self, url: str, options: dict, scrape, force_refresh: bool = False):
+        """
+        Returns (file_list, zip_path, reused). `scrape` is called without arguments only when
+        there is neither a fresh cached result nor an identical scrape already running.
+        A forced refresh still shares a scrape that finishes after it was requested.
+        """
+        key = self.make_key(url, options)
+        since = time.time() if force_refresh else 0
+        entry = self._lookup(key, since)
+        if entry is None:
+            # Holding the key's lock marks the scrape as in flight; identical requests block here until it is stored.
+            with self.storage.lock(f"scrape-{key}"):
+                entry = self._lookup(key, since)
+                if entry is None:
+                    file_list, zip_path = scrape()
+                    # An empty scrape is usually a transient failure, so it is not cached.
+                    if file_list: self._store(key, file_list, zip_path)
+                    return file_list, zip_path, False
+
+        logger.info(f"Serving {url} from a scrape finished {int(time.time() - entry['finished_at'])}s ago")
+        return entry["file_list"], entry["zip_path"], True
+
+
+@lru_cache(maxsize=None)
+def get_result_cache() -> ScrapeResultCache:
+    from django.conf import settings
+    return ScrapeResultCache(get_scrape_storage(), getattr(settings, 'SCRAPER_RESULT_CACHE_TTL', DEFAULT_RESULT_CACHE_TTL))
@@ -4,13 +4,20 @@ import shutil
 import zipfile
 import threading
 import logging
+import html
+import multiprocessing
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 import time
 import requests
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from bs4 import BeautifulSoup, NavigableString, Tag
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import json
+from contextlib import nullcontext
+
+from .storage import ScrapeStorage
+from .render_mode import RenderModeAdvisor, RENDER_STATIC, RENDER_DYNAMIC
+from .dedup import ContentDeduplicator, content_fingerprint
 
 # SELENIUM SETUP 
 try:
@@ -30,13 +37,26 @@ CSS_URL_RE = re.compile(r"url\(\s*['\"]?(.*?)['\"]?\s*\)", re.IGNORECASE)
 DEFAULT_USER_AGENT = "MirrorBot/2.0 (AdvancedConverter)"
 DEFAULT_MAX_DEPTH = 1
 DEFAULT_MAX_WORKERS = 10
+# Parsing and rewriting is CPU-bound, so it runs in worker processes rather than threads.
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1
 REQUEST_DELAY = 0.1
 REQUEST_TIMEOUT = 20
 DYNAMIC_SCRAPE_TIMEOUT = 30
 DYNAMIC_SCRAPE_THRESHOLD = 500
+# Site-wide chrome that is left out of the duplicate-detection fingerprint.
+BOILERPLATE_TAGS = ['nav', 'header', 'footer', 'aside', 'script', 'style', 'noscript', 'template']
+# AI prompts are split at element boundaries once the page plus its CSS exceeds this budget.
+AI_CHUNK_TOKEN_BUDGET = 12000
+# Share of the budget the CSS may take; larger stylesheets are trimmed to the rules each chunk uses.
+AI_CSS_BUDGET_SHARE = 0.25
+AI_PROMPT_OVERHEAD_TOKENS = 400
+AI_MAX_PARALLEL_CHUNKS = 4
+CHARS_PER_TOKEN = 4
 # --- FIX: This reliably finds the project's root directory and sets the output folder there. ---
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 OUTPUT_DIR = PROJECT_ROOT / "mirror_upgraded"
+# Written to the scrape root; lists duplicate pages that were saved as redirects to their canonical copy.
+ALIASES_FILENAME = "aliases.json"
 lock = threading.Lock()
 
 # LOGGING SETUP 
@@ -71,7 +91,150 @@ def call_gemini_api(payload: dict) -> dict | None:
         logger.error(f"An unexpected error occurred during Gemini API call: {e}")
     return None
 
-def decompose_html_with_ai(html_content: str, css_content: str) -> dict | None:
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text and markup; close enough for budgeting.
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def css_token_budget(token_budget: int = AI_CHUNK_TOKEN_BUDGET) -> int:
+    return int(token_budget * AI_CSS_BUDGET_SHARE)
+
+def html_token_budget(css_content: str, token_budget: int = AI_CHUNK_TOKEN_BUDGET) -> int:
+    # CSS over its share is trimmed per chunk, so a large stylesheet never forces the HTML to be split further.
+    css_tokens = min(estimate_tokens(css_content), css_token_budget(token_budget))
+    return token_budget - css_tokens - AI_PROMPT_OVERHEAD_TOKENS
+
+def split_css_blocks(css_content: str) -> list:
+    """Splits a stylesheet into its top-level blocks, e.g. ".a { .. }" or "@media (..) { .b { .. } }"."""
+    css_content = re.sub(r'/\*.*?\*/', '', css_content, flags=re.S)
+    blocks, depth, start = [], 0, 0
+    for i, char in enumerate(css_content):
+        if char == '{':
+            depth += 1
+        elif char == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                blocks.append(css_content[start:i + 1].strip())
+                start = i + 1
+    return blocks
+
+def trim_css_block(block: str, names: set) -> str | None:
+    """Returns the part of a top-level CSS block that applies to markup using `names` (".class"/"#id"), or None."""
+    prelude, body = block.split('{', 1)
+    # Statements such as @import or @charset end up in front of the next block's selector.
+    prelude = prelude.rsplit(';', 1)[-1].strip()
+    if prelude.startswith(('@media', '@supports')):
+        inner = [kept for inner_block in split_css_blocks(body[:-1]) if (kept := trim_css_block(inner_block, names))]
+        return f"{prelude} {{\n" + "\n".join(inner) + "\n}" if inner else None
+    # Other at-rules (@font-face, @keyframes) are kept; a selector needs every class and id it names.
+    if prelude.startswith('@') or any(set(re.findall(r'[.#]-?[_a-zA-Z][\w-]*', selector)) <= names for selector in prelude.split(',')):
+        return f"{prelude} {{{body}"
+    return None
+
+def trim_css_for_html(css_content: str, html_content: str, token_budget: int) -> str:
+    """
+    Returns the CSS to send along with html_content. Stylesheets within token_budget are sent
+    whole; larger ones keep only the rules whose classes and ids appear in the HTML, and are
+    cut off at the budget if even that is too large.
+    """
+    if estimate_tokens(css_content) <= token_budget: return css_content
+    names = set()
+    for tag in BeautifulSoup(html_content, "html.parser").find_all(True):
+        names.update(f".{name}" for name in tag.get_attribute_list('class') if name)
+        if tag.get('id'): names.add(f"#{tag['id']}")
+
+    kept, used = [], 0
+    for block in filter(None, (trim_css_block(block, names) for block in split_css_blocks(css_content))):
+        block_tokens = estimate_tokens(block)
+        if used + block_tokens > token_budget:
+            logger.warning("CSS used by a chunk exceeds its share of the prompt budget; the rest is left out.")
+            break
+        kept.append(block)
+        used += block_tokens
+    return "\n".join(kept)
+
+def split_html_node(node, token_budget: int) -> list:
+    """
+    Recursively splits a node into markup chunks of at most token_budget tokens.
+    Oversized elements are split between their children, and each group of children is
+    re-wrapped in a copy of the parent's opening tag so classes and ids keep their context.
+    Leaf content that is still too large is returned whole.
+    """
+    # output_ready() re-escapes text and keeps comment delimiters; str() would return the raw string.
+    markup = node.decode() if isinstance(node, Tag) else node.output_ready()
+    if estimate_tokens(markup) <= token_budget or not isinstance(node, Tag) or not node.contents:
+        return [markup]
+
+    if isinstance(node, BeautifulSoup):
+        opening, closing = "", ""
+    else:
+        attrs = "".join(f' {k}="{html.escape(" ".join(v) if isinstance(v, list) else v)}"' for k, v in node.attrs.items())
+        opening, closing = f"<{node.name}{attrs}>", f"</{node.name}>"
+
+    pieces = [piece for child in node.contents for piece in split_html_node(child, token_budget)]
+    wrapper_tokens = estimate_tokens(opening + closing)
+    groups, current, used = [], [], wrapper_tokens
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if current and used + piece_tokens > token_budget:
+            groups.append(current)
+            current, used = [], wrapper_tokens
+        current.append(piece)
+        used += piece_tokens
+    if current: groups.append(current)
+    return [opening + "".join(group) + closing for group in groups]
+
+def chunk_html(html_content: str, token_budget: int) -> list:
+    if estimate_tokens(html_content) <= token_budget: return [html_content]
+    soup = BeautifulSoup(html_content, "html.parser")
+    return [chunk for chunk in split_html_node(soup.body or soup, token_budget) if chunk.strip()]
+
+def extract_jsx_body(component_code: str) -> str:
+    match = re.search(r"return\s*\(([\s\S]*)\);?\s*\}?", component_code, re.DOTALL)
+    return match.group(1).strip() if match else component_code
+
+def build_part_definition(component_code: str, part_name: str) -> str:
+    """Keeps a chunk's whole component (hooks, handlers, constants) minus any imports and exports."""
+    lines = [line for line in component_code.strip().splitlines() if not line.lstrip().startswith(("import ", "export default"))]
+    code = "\n".join(re.sub(r"^export\s+", "", line) for line in lines)
+    if re.search(rf"\b(const|let|function)\s+{part_name}\b", code): return code
+    return f"const {part_name} = () => {{\n  return (\n    {extract_jsx_body(code)}\n  );\n}};"
+
+def build_component_module(react_result: dict, component_name: str, fragment: bool = False) -> str:
+    code = react_result['react_component']
+    imports = "import React"
+    if "useState" in code: imports += ", { useState }"
+    imports += " from 'react';\n"
+    if "<Link" in code: imports += "import { Link } from 'react-router-dom';\n"
+    # Stitched results already define the part components and the component itself.
+    if react_result.get('stitched'):
+        return f"{imports}\n{code}\nexport default {component_name};\n"
+
+    component_body = extract_jsx_body(code)
+    if fragment: component_body = f"<>\n      {component_body}\n    </>"
+    return f"{imports}\nconst {component_name} = () => {{\n  return (\n    {component_body}\n  );\n}};\n\nexport default {component_name};\n"
+
+def decompose_html_with_ai(html_content: str, css_content: str, token_budget: int = AI_CHUNK_TOKEN_BUDGET) -> dict | None:
+    chunks = chunk_html(html_content, html_token_budget(css_content, token_budget))
+    chunk_css = [trim_css_for_html(css_content, chunk, css_token_budget(token_budget)) for chunk in chunks]
+    if len(chunks) == 1: return request_html_decomposition(html_content, chunk_css[0])
+
+    logger.info(f"HTML exceeds the prompt budget, decomposing {len(chunks)} chunks in parallel...")
+    with ThreadPoolExecutor(max_workers=AI_MAX_PARALLEL_CHUNKS) as executor:
+        results = list(executor.map(request_html_decomposition, chunks, chunk_css))
+
+    components = {}
+    for index, result in enumerate(results, start=1):
+        if not result:
+            logger.warning(f"Decomposition of chunk {index}/{len(chunks)} failed; its components are missing.")
+            continue
+        for name, snippet in result.items():
+            unique_name, suffix = name, 2
+            while unique_name in components:
+                unique_name, suffix = f"{name}{suffix}", suffix + 1
+            components[unique_name] = snippet
+    return components or None
+
+def request_html_decomposition(html_content: str, css_content: str) -> dict | None:
     logger.info("Decomposing HTML into logical components with AI...")
     prompt = f"""
     You are a senior front-end architect. Your task is to analyze the following HTML and CSS, and decompose the HTML into a structured JSON object of logical, reusable components.
@@ -92,7 +255,37 @@ def decompose_html_with_ai(html_content: str, css_content: str) -> dict | None:
     payload = {"contents": [{"parts": [{"text": prompt}]}], "generationConfig": {"responseMimeType": "application/json"}}
     return call_gemini_api(payload)
 
-def convert_html_snippet_to_component(html_snippet: str, css_content: str, component_name: str) -> dict | None:
+def convert_html_snippet_to_component(html_snippet: str, css_content: str, component_name: str, token_budget: int = AI_CHUNK_TOKEN_BUDGET) -> dict | None:
+    """
+    Converts a snippet into a React component. Snippets over the token budget are split
+    at section boundaries, converted in parallel as {component_name}Part1..N and stitched
+    into one module: each part keeps its own component definition, followed by
+    {component_name}, which renders <Part1 /> .. <PartN /> in document order.
+    """
+    chunks = chunk_html(html_snippet, html_token_budget(css_content, token_budget))
+    chunk_css = [trim_css_for_html(css_content, chunk, css_token_budget(token_budget)) for chunk in chunks]
+    if len(chunks) == 1: return request_react_component(html_snippet, chunk_css[0], component_name)
+
+    logger.info(f"{component_name} exceeds the prompt budget, converting {len(chunks)} chunks in parallel...")
+    part_names = [f"{component_name}Part{i}" for i in range(1, len(chunks) + 1)]
+    with ThreadPoolExecutor(max_workers=AI_MAX_PARALLEL_CHUNKS) as executor:
+        results = list(executor.map(request_react_component, chunks, chunk_css, part_names))
+
+    definitions, rendered = [], []
+    for part_name, result in zip(part_names, results):
+        if not result or 'react_component' not in result:
+            logger.warning(f"Conversion of {part_name} failed; it is missing from {component_name}.")
+            continue
+        definitions.append(build_part_definition(result['react_component'], part_name))
+        rendered.append(f"      <{part_name} />")
+    if not definitions: return None
+
+    parts_code = "\n\n".join(definitions)
+    rendered_parts = "\n".join(rendered)
+    component_code = f"{parts_code}\n\nconst {component_name} = () => {{\n  return (\n    <>\n{rendered_parts}\n    </>\n  );\n}};\n"
+    return {"react_component": component_code, "stitched": True}
+
+def request_react_component(html_snippet: str, css_content: str, component_name: str) -> dict | None:
     logger.info(f"Converting snippet to React component: {component_name}...")
     prompt = f"""
     You are an expert React developer specializing in Tailwind CSS. Convert the provided HTML snippet and its full CSS context into a single, self-contained React JSX component.
@@ -124,6 +317,29 @@ def convert_css_to_tailwind(css_content: str) -> dict | None:
     return call_gemini_api(payload)
 
 # --- SCRAPING & FILE HANDLING ---
+shared_parse_pool = None
+shared_parse_pool_lock = threading.Lock()
+
+def create_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """Workers are spawned rather than forked: the server and the batch command both fork from multi-threaded processes."""
+    return ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"))
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """
+    Parse pool shared by every scrape started from the web app, sized by SCRAPER_PARSE_WORKERS.
+    A pool whose worker died is broken for good, so it is replaced on the next call.
+    """
+    global shared_parse_pool
+    from django.conf import settings
+    with shared_parse_pool_lock:
+        if shared_parse_pool is not None and shared_parse_pool._broken:
+            logger.warning("Parse pool is broken (a worker died). Starting a new one.")
+            shared_parse_pool.shutdown(wait=False, cancel_futures=True)
+            shared_parse_pool = None
+        if shared_parse_pool is None:
+            shared_parse_pool = create_parse_pool(getattr(settings, 'SCRAPER_PARSE_WORKERS', DEFAULT_PARSE_WORKERS))
+        return shared_parse_pool
+
 def setup_selenium_driver():
     if not SELENIUM_AVAILABLE: return None
     try:
@@ -185,57 +401,122 @@ def find_css_assets(css_text: str, css_url: str, base_url: str, root_dir: Path)
             found_assets.add((asset_url, get_local_path(asset_url, root_dir, 'assets')))
     return found_assets
 
-def scrape_page(url: str, depth: int, base_url: str, root_dir: Path, session: requests.Session, driver, to_crawl: set, crawled_pages: set, assets_to_download: set):
-    if url in crawled_pages or depth > DEFAULT_MAX_DEPTH: return
-    crawled_pages.add(url)
-    logger.info(f"Scraping page: {url} at depth {depth}")
-
-    content, content_type = fetch_static(session, url, driver)
-    
-    if driver and (not content or (content and 'text/html' in content_type and len(BeautifulSoup(content, "html.parser").body.get_text(strip=True)) < DYNAMIC_SCRAPE_THRESHOLD)):
-        logger.info(f"Static content for {url} is sparse or failed. Attempting dynamic scrape with Selenium.")
-        dynamic_content = fetch_with_selenium(url, driver)
-        if dynamic_content:
-            content = dynamic_content.encode('utf-8')
-            content_type = 'text/html'
-
-    if not content or 'text/html' not in content_type:
-        logger.warning(f"No valid HTML content found for {url}")
-        return
+def main_content_text(soup: BeautifulSoup) -> str:
+    """Text of <main> (or the body) without shared navigation, headers, footers and scripts."""
+    root = soup.find('main') or soup.body or soup
+    return " ".join(
+        text.strip() for text in root.find_all(string=True)
+        if type(text) is NavigableString and text.strip() and not text.find_parent(BOILERPLATE_TAGS)
+    )
 
+def parse_page_content(content: bytes, url: str, depth: int, max_depth: int, base_url: str, root_dir: Path):
+    """
+    Parses a fetched page, collects the links and assets it references and rewrites them
+    to local relative paths. Runs inside the parse process pool, so it takes and returns
+    plain picklable values and performs no I/O.
+    Returns (rewritten_html, text_length, page_links, assets, stylesheets, fingerprint).
+    """
     soup = BeautifulSoup(content, "html.parser")
+    text_root = soup.body or soup
+    text_length = len(text_root.get_text(strip=True))
+    fingerprint = content_fingerprint(main_content_text(soup))
+
     page_local_path = get_local_path(url, root_dir, 'html')
-    
     asset_map = {"link": "css", "script": "js", "img": "images"}
-    
+    page_links, assets, stylesheets = set(), set(), set()
+
     for tag in soup.find_all(['a', 'link', 'script', 'img']):
         attr = "href" if tag.name in ('a', 'link') else "src"
         if not tag.has_attr(attr) or not tag[attr]: continue
-            
+
         asset_url = urljoin(url, tag[attr].split('#')[0])
         if not asset_url.startswith(base_url): continue
 
         if tag.name == 'a':
-            if depth < DEFAULT_MAX_DEPTH and asset_url.rstrip('/') != url.rstrip('/'):
-                to_crawl.add(asset_url)
+            if depth < max_depth and asset_url.rstrip('/') != url.rstrip('/'):
+                page_links.add(asset_url)
             asset_local_path = get_local_path(asset_url, root_dir, 'html')
         else:
             asset_subdir = asset_map.get(tag.name, 'assets')
             asset_local_path = get_local_path(asset_url, root_dir, asset_subdir)
-            assets_to_download.add((asset_url, asset_local_path))
-            
+            assets.add((asset_url, asset_local_path))
             if asset_subdir == 'css':
-                css_content, _ = fetch_static(session, asset_url, None)
-                if css_content:
-                    assets_to_download.update(find_css_assets(css_content.decode('utf-8', 'ignore'), asset_url, base_url, root_dir))
-        
+                stylesheets.add(asset_url)
+
         try:
             relative_path = os.path.relpath(asset_local_path, start=page_local_path.parent)
             tag[attr] = Path(relative_path).as_posix()
         except ValueError:
             tag[attr] = asset_local_path.as_posix()
 
-    save_content(page_local_path, soup.encode("utf-8"))
+    return soup.encode("utf-8"), text_length, page_links, assets, stylesheets, fingerprint
+
+def build_alias_page(alias_path: Path, canonical_path: Path) -> bytes:
+    target = Path(os.path.relpath(canonical_path, start=alias_path.parent)).as_posix()
+    return f'<!DOCTYPE html><html><head><meta http-equiv="refresh" content="0; url={target}"><link rel="canonical" href="{target}"></head><body><a href="{target}">{target}</a></body></html>'.encode('utf-8')
+
+def scrape_page(url: str, depth: int, base_url: str, root_dir: Path, session: requests.Session, driver, to_crawl: set, crawled_pages: set, assets_to_download: set, parse_pool: ProcessPoolExecutor, max_depth: int = DEFAULT_MAX_DEPTH, render_advisor: RenderModeAdvisor = None, deduplicator: ContentDeduplicator = None):
+    if url in crawled_pages or depth > max_depth: return
+    crawled_pages.add(url)
+    logger.info(f"Scraping page: {url} at depth {depth}")
+
+    # None means "probe": fetch statically, fall back to Selenium if sparse, and teach the advisor.
+    mode = render_advisor.choose(url) if driver and render_advisor else None
+    content_type, parsed = '', None
+
+    if mode == RENDER_DYNAMIC:
+        logger.info(f"Pages like {url} need JS rendering. Fetching directly with Selenium.")
+        dynamic_content = fetch_with_selenium(url, driver)
+        if dynamic_content:
+            content_type = 'text/html'
+            parsed = parse_pool.submit(parse_page_content, dynamic_content.encode('utf-8'), url, depth, max_depth, base_url, root_dir).result()
+
+    if not parsed:
+        content, content_type = fetch_static(session, url, driver)
+        if content and 'text/html' in content_type:
+            parsed = parse_pool.submit(parse_page_content, content, url, depth, max_depth, base_url, root_dir).result()
+
+        static_parsed = parsed
+        is_sparse = not content or bool(parsed and parsed[1] < DYNAMIC_SCRAPE_THRESHOLD)
+        # Pages routed as static still fall back to Selenium when the static fetch itself fails.
+        if driver and (mode is None or (mode == RENDER_STATIC and not content)) and (not content or parsed):
+            needs_js = False
+            if is_sparse:
+                logger.info(f"Static content for {url} is sparse or failed. Attempting dynamic scrape with Selenium.")
+                dynamic_content = fetch_with_selenium(url, driver)
+                if dynamic_content:
+                    content_type = 'text/html'
+                    parsed = parse_pool.submit(parse_page_content, dynamic_content.encode('utf-8'), url, depth, max_depth, base_url, root_dir).result()
+                    needs_js = bool(static_parsed) and parsed[1] > static_parsed[1]
+            # A failed fetch (404, timeout) says nothing about rendering, so only pages that came back as HTML are samples.
+            if render_advisor and mode is None and static_parsed: render_advisor.record(url, needs_js=needs_js)
+
+    if not parsed or 'text/html' not in content_type:
+        logger.warning(f"No valid HTML content found for {url}")
+        return
+
+    rewritten_html, _, page_links, assets, stylesheets, fingerprint = parsed
+    page_local_path = get_local_path(url, root_dir, 'html')
+
+    # Duplicates are saved as a redirect to the canonical copy and their links are not expanded.
+    canonical = deduplicator.check(url, fingerprint) if deduplicator else None
+    if canonical:
+        logger.info(f"{url} duplicates {canonical}. Saving an alias instead of a copy.")
+        canonical_local_path = get_local_path(canonical, root_dir, 'html')
+        if page_local_path != canonical_local_path:
+            save_content(page_local_path, build_alias_page(page_local_path, canonical_local_path))
+        return
+
+    to_crawl.update(page_links)
+    assets_to_download.update(assets)
+
+    # Stylesheets are fetched here on the I/O thread; scanning them for url() references is handed back to the pool.
+    for css_url in stylesheets:
+        css_content, _ = fetch_static(session, css_url, None)
+        if css_content:
+            assets_to_download.update(parse_pool.submit(find_css_assets, css_content.decode('utf-8', 'ignore'), css_url, base_url, root_dir).result())
+
+    save_content(page_local_path, rewritten_html)
 
 def create_zip_from_directory(source_dir: Path, zip_path: Path) -> str:
     logger.info(f"Creating archive: {zip_path}")
@@ -263,81 +544,146 @@ def decompose_html(soup: BeautifulSoup) -> dict:
 # --- MAIN WORKFLOW FUNCTIONS ---
 
 # FIX: Renamed function to match the import in views.py
-def run_scrape_workflow(base_url: str, depth: int = DEFAULT_MAX_DEPTH, workers: int = DEFAULT_MAX_WORKERS, output: str = None, user_agent: str = DEFAULT_USER_AGENT):
+def run_scrape_workflow(base_url: str, depth: int = DEFAULT_MAX_DEPTH, workers: int = DEFAULT_MAX_WORKERS, output: str = None, user_agent: str = DEFAULT_USER_AGENT, parse_workers: int = DEFAULT_PARSE_WORKERS, storage: ScrapeStorage = None, parse_pool: ProcessPoolExecutor = None, metrics: dict = None):
+    """
+    Mirrors base_url into a new scrape directory and archives it. Pass parse_pool to share
+    one process pool between several concurrent scrapes; pass a metrics dict to have it
+    filled with page/asset counts, byte totals and stage timings.
+    """
+    started = time.monotonic()
     base_url = base_url.rstrip("/")
-    scrape_id = f"{urlparse(base_url).netloc}_{int(time.time())}"
+    storage = storage or ScrapeStorage(Path(output or OUTPUT_DIR))
+    scrape_id = storage.new_scrape_id(urlparse(base_url).netloc)
     
-    output_dir = Path(output or OUTPUT_DIR)
+    output_dir = storage.root
     output_dir.mkdir(exist_ok=True)
-    scrape_dir = output_dir / scrape_id
+    scrape_dir = storage.scrape_dir(scrape_id)
     if scrape_dir.exists(): shutil.rmtree(scrape_dir)
     scrape_dir.mkdir(parents=True)
 
-    session = requests.Session()
-    session.headers.update({"User-Agent": user_agent})
-    
-    driver = setup_selenium_driver()
-
-    to_crawl, crawled_pages, assets_to_download = {base_url}, set(), set()
-    
-    for current_depth in range(depth + 1):
-        urls_to_process = list(to_crawl - crawled_pages)
-        if not urls_to_process: break
-        logger.info(f"--- Crawling depth {current_depth}: {len(urls_to_process)} pages ---")
+    # The scrape is only registered once its archive exists; a failed crawl must not leave an untracked tree behind.
+    driver = None
+    try:
+        session = requests.Session()
+        session.headers.update({"User-Agent": user_agent})
+
+        driver = setup_selenium_driver()
+
+        to_crawl, crawled_pages, assets_to_download = {base_url}, set(), set()
+        render_advisor = RenderModeAdvisor()
+        deduplicator = ContentDeduplicator()
+
+        # Network I/O stays on the thread pool; each thread hands its parse/rewrite job to the process pool.
+        with (nullcontext(parse_pool) if parse_pool else create_parse_pool(parse_workers)) as parse_pool:
+            for current_depth in range(depth + 1):
+                urls_to_process = list(to_crawl - crawled_pages)
+                if not urls_to_process: break
+                logger.info(f"--- Crawling depth {current_depth}: {len(urls_to_process)} pages ---")
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(scrape_page, url, current_depth, base_url, scrape_dir, session, driver, to_crawl, crawled_pages, assets_to_download, parse_pool, depth, render_advisor, deduplicator) for url in urls_to_process]
+                    for future in as_completed(futures): future.result()
+
+        if driver: driver.quit()
+        driver = None
+        crawl_finished = time.monotonic()
+
+        if deduplicator.aliases:
+            aliases = []
+            for alias, canonical in sorted(deduplicator.aliases.items()):
+                aliases.append({
+                    "url": alias,
+                    "path": get_local_path(alias, scrape_dir, 'html').relative_to(scrape_dir).as_posix(),
+                    "canonical_url": canonical,
+                    "canonical_path": get_local_path(canonical, scrape_dir, 'html').relative_to(scrape_dir).as_posix(),
+                })
+            save_content(scrape_dir / ALIASES_FILENAME, json.dumps(aliases, indent=2).encode('utf-8'))
+
+        logger.info(f"--- Downloading {len(assets_to_download)} assets ---")
         with ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = [executor.submit(scrape_page, url, current_depth, base_url, scrape_dir, session, driver, to_crawl, crawled_pages, assets_to_download) for url in urls_to_process]
-            for future in as_completed(futures): future.result()
-
-    if driver: driver.quit()
-
-    logger.info(f"--- Downloading {len(assets_to_download)} assets ---")
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        future_map = {executor.submit(fetch_static, session, url, None): path for url, path in assets_to_download}
-        for future in as_completed(future_map):
-            content, _ = future.result()
-            if content: save_content(future_map[future], content)
-
-    # --- FIX: Generate proper relative paths ---
-    file_list = [
-        {
-            "name": p.name,
-            "path": str(p.relative_to(output_dir))
-        } 
-        for p in sorted(scrape_dir.rglob("*")) if p.is_file()
-    ]
-
-    # --- FIX: Save the zip file to the project root where the view expects it ---
-    zip_filename = f"{urlparse(base_url).netloc}_scraped.zip"
-    zip_path = output_dir.parent / zip_filename
-    create_zip_from_directory(scrape_dir, zip_path)
+            future_map = {executor.submit(fetch_static, session, url, None): path for url, path in assets_to_download}
+            for future in as_completed(future_map):
+                content, _ = future.result()
+                if content: save_content(future_map[future], content)
+        assets_finished = time.monotonic()
+
+        # --- FIX: Generate proper relative paths ---
+        file_list = [
+            {
+                "name": p.name,
+                "path": str(p.relative_to(output_dir))
+            } 
+            for p in sorted(scrape_dir.rglob("*")) if p.is_file()
+        ]
+
+        zip_path = storage.archive_path(scrape_id)
+        create_zip_from_directory(scrape_dir, zip_path)
+        storage.register(scrape_id)
+    except BaseException:
+        logger.error(f"Scrape of {base_url} failed, removing the partial scrape {scrape_id}")
+        storage.discard(scrape_id)
+        raise
+    finally:
+        if driver: driver.quit()
+
+    if metrics is not None:
+        metrics.update({
+            "scrape_id": scrape_id,
+            "pages": len(crawled_pages),
+            "assets": len(assets_to_download),
+            "files": len(file_list),
+            "bytes": sum(p.stat().st_size for p in scrape_dir.rglob("*") if p.is_file()),
+            "archive_bytes": zip_path.stat().st_size,
+            "render_modes": render_advisor.snapshot(),
+            "duplicate_pages": len(deduplicator.aliases),
+            "timings": {
+                "crawl": round(crawl_finished - started, 3),
+                "assets": round(assets_finished - crawl_finished, 3),
+                "total": round(time.monotonic() - started, 3),
+            },
+        })
     
     logger.info(f"Scraping complete. Zipped content at: {zip_path}")
     # --- FIX: Return the file_list and zip_path as expected by the view ---
     return file_list, str(zip_path)
 
-def run_tailwind_conversion(source_dir_str: str):
+def run_tailwind_conversion(source_dir_str: str, storage: ScrapeStorage = None):
     source_dir = Path(source_dir_str)
-    project_name = f"{source_dir.name}-tailwind"
-    target_dir = source_dir.parent / project_name
+    storage = storage or ScrapeStorage(source_dir.parent)
+    # Sessions sharing a cached scrape must not rebuild the same conversion tree at the same time.
+    with storage.lock(f"{source_dir.name}-tailwind"):
+        # The scrape may have been evicted since the session that converts it was started.
+        if not source_dir.is_dir(): raise FileNotFoundError(f"Scrape {source_dir.name} is no longer stored. Please scrape the site again.")
+        return build_tailwind_project(source_dir, storage)
+
+def build_tailwind_project(source_dir: Path, storage: ScrapeStorage) -> str:
+    scrape_id = source_dir.name
+    project_name = f"{scrape_id}-tailwind"
+    target_dir = storage.variant_dir(scrape_id, "tailwind")
     if target_dir.exists(): shutil.rmtree(target_dir)
     shutil.copytree(source_dir, target_dir)
-    logger.info(f"--- Starting Tailwind Conversion for {source_dir_str} ---")
+    logger.info(f"--- Starting Tailwind Conversion for {source_dir} ---")
     for file_path in target_dir.rglob("*.css"):
         tailwind_result = convert_css_to_tailwind(file_path.read_text(encoding='utf-8', errors='ignore'))
         if tailwind_result and 'tailwind_classes' in tailwind_result:
             save_content(file_path.with_suffix('.tailwind.txt'), tailwind_result['tailwind_classes'].encode('utf-8'))
     
-    # --- FIX: Save the zip file to the project root where the view expects it ---
-    zip_filename = f"{project_name}.zip"
-    zip_path = target_dir.parent / zip_filename
+    zip_path = storage.archive_path(scrape_id, "tailwind")
     create_zip_from_directory(target_dir, zip_path)
+    storage.register(scrape_id)
     
     return str(zip_path)
 
-def run_react_conversion_workflow(source_dir_str: str):
+def run_react_conversion_workflow(source_dir_str: str, storage: ScrapeStorage = None, token_budget: int = AI_CHUNK_TOKEN_BUDGET):
     source_dir = Path(source_dir_str)
-    project_name = f"{source_dir.name}-react-pro"
-    target_dir = source_dir.parent / project_name
+    storage = storage or ScrapeStorage(source_dir.parent)
+    with storage.lock(f"{source_dir.name}-react-pro"):
+        if not source_dir.is_dir(): raise FileNotFoundError(f"Scrape {source_dir.name} is no longer stored. Please scrape the site again.")
+        return build_react_project(source_dir, storage, token_budget)
+
+def build_react_project(source_dir: Path, storage: ScrapeStorage, token_budget: int = AI_CHUNK_TOKEN_BUDGET) -> str:
+    scrape_id = source_dir.name
+    project_name = f"{scrape_id}-react-pro"
+    target_dir = storage.variant_dir(scrape_id, "react-pro")
     if target_dir.exists(): shutil.rmtree(target_dir)
     
     logger.info(f"--- Generating Professional React Project: {project_name} ---")
@@ -361,7 +707,14 @@ def run_react_conversion_workflow(source_dir_str: str):
     shared_components = set()
     html_source_dir = source_dir / "html"
 
+    # Alias pages are redirects to a canonical page that is converted on its own.
+    alias_paths = set()
+    if (source_dir / ALIASES_FILENAME).exists():
+        aliases = json.loads((source_dir / ALIASES_FILENAME).read_text(encoding='utf-8'))
+        alias_paths = {source_dir / entry["path"] for entry in aliases if entry["path"] != entry["canonical_path"]}
+
     for html_file_path in sorted(list(html_source_dir.rglob("*.html"))):
+        if html_file_path in alias_paths: continue
         try:
             html_content = html_file_path.read_text(encoding='utf-8', errors='ignore')
             soup = BeautifulSoup(html_content, 'html.parser')
@@ -379,32 +732,17 @@ def run_react_conversion_workflow(source_dir_str: str):
             
             for comp_name, comp_html in decomposed_parts.get("shared_components", {}).items():
                 if comp_name not in shared_components:
-                    react_result = convert_html_snippet_to_component(comp_html, css_contents, comp_name)
+                    react_result = convert_html_snippet_to_component(comp_html, "\n".join(css_contents), comp_name, token_budget)
                     if react_result and 'react_component' in react_result:
-                        component_body = react_result['react_component']
-                        match = re.search(r"return\s*\(([\s\S]*)\);?\s*\}?", component_body, re.DOTALL)
-                        if match: component_body = match.group(1).strip()
-                        
-                        imports = "import React from 'react';\n"
-                        if "<Link" in component_body: imports += "import { Link } from 'react-router-dom';\n"
-                        component_code = f"{imports}\nconst {comp_name} = () => {{\n  return (\n    {component_body}\n  );\n}};\n\nexport default {comp_name};\n"
+                        component_code = build_component_module(react_result, comp_name)
                         save_content(components_dir / f"{comp_name}.jsx", component_code.encode('utf-8'))
                         shared_components.add(comp_name)
 
             page_html = decomposed_parts.get("page_specific_content")
             if page_html:
-                react_result = convert_html_snippet_to_component(page_html, css_contents, page_name)
+                react_result = convert_html_snippet_to_component(page_html, "\n".join(css_contents), page_name, token_budget)
                 if react_result and 'react_component' in react_result:
-                    imports = "import React"
-                    if "useState" in react_result['react_component']: imports += ", { useState }"
-                    imports += " from 'react';\n"
-                    if "<Link" in react_result['react_component']: imports += "import { Link } from 'react-router-dom';\n"
-                    
-                    component_body = react_result['react_component']
-                    match = re.search(r"return\s*\(([\s\S]*)\);?\s*\}?", component_body, re.DOTALL)
-                    if match: component_body = match.group(1).strip()
-
-                    component_code = f"{imports}\nconst {page_name} = () => {{\n  return (\n    <>\n      {component_body}\n    </>\n  );\n}};\n\nexport default {page_name};\n"
+                    component_code = build_component_module(react_result, page_name, fragment=True)
                     save_content(pages_dir / f"{page_name}.jsx", component_code.encode('utf-8'))
                     route_path = f"/{Path(html_file_path.stem).name}" if Path(html_file_path.stem).name.lower() != 'index' else '/'
                     page_info.append({"name": page_name, "path": route_path, "displayName": page_name.replace("Page", "")})
@@ -430,9 +768,8 @@ def run_react_conversion_workflow(source_dir_str: str):
     if (source_dir / "images").exists(): shutil.copytree(source_dir / "images", public_dir / "images")
     if (source_dir / "assets").exists(): shutil.copytree(source_dir / "assets", public_dir / "assets")
 
-    # --- FIX: Save the zip file to the project root where the view expects it ---
-    zip_filename = f"{project_name}.zip"
-    zip_path = target_dir.parent / zip_filename
+    zip_path = storage.archive_path(scrape_id, "react-pro")
     create_zip_from_directory(target_dir, zip_path)
+    storage.register(scrape_id)
     
     return str(zip_path)
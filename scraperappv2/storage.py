@@ -0,0 +1,229 @@
+import json
+import os
+import shutil
+import threading
+import time
+import logging
+import uuid
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Without fcntl (Windows) locks only serialize threads within this process.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# CONFIGURATION
+DEFAULT_STORAGE_QUOTA = 5 * 1024 ** 3
+ARCHIVE_SUBDIR = "archives"
+INDEX_FILENAME = "storage_index.json"
+# Kept by result_cache.ScrapeResultCache; like the index it is never served.
+RESULT_CACHE_FILENAME = "result_cache.json"
+LOCK_SUBDIR = "locks"
+# Derived trees live next to the scrape as "<scrape_id>-<variant>".
+VARIANTS = ("tailwind", "react-pro")
+
+thread_locks = {}
+thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path: Path):
+    """
+    Exclusive lock on `path`, held against other threads of this process and, through
+    flock, against other processes (e.g. several gunicorn workers).
+    """
+    with thread_locks_guard:
+        thread_lock = thread_locks.setdefault(str(path), threading.Lock())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with thread_lock, open(path, "a") as lock_file:
+        if fcntl: fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl: fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def try_file_lock(path: Path):
+    """Like file_lock, but yields False right away instead of waiting when the lock is held."""
+    with thread_locks_guard:
+        thread_lock = thread_locks.setdefault(str(path), threading.Lock())
+    if not thread_lock.acquire(blocking=False):
+        yield False
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a") as lock_file:
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+            try:
+                yield True
+            finally:
+                if fcntl: fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        thread_lock.release()
+
+
+class ScrapeStorage:
+    """
+    Owns the on-disk layout of mirror_upgraded. Every artifact is namespaced by scrape id:
+        <root>/<scrape_id>/                     the mirrored site
+        <root>/<scrape_id>-<variant>/           tailwind / react-pro conversions
+        <root>/archives/<scrape_id>[-variant].zip
+    Scrapes are tracked in an index with their size and last access time, and the
+    least recently downloaded scrapes are evicted once the quota is exceeded. Scrapes with
+    a conversion in progress are never evicted.
+    """
+
+    def __init__(self, root: Path, quota_bytes: int = DEFAULT_STORAGE_QUOTA):
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+
+    # --- PATHS ---
+    def new_scrape_id(self, netloc: str) -> str:
+        return f"{netloc}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+    def scrape_dir(self, scrape_id: str) -> Path:
+        return self.root / scrape_id
+
+    def variant_dir(self, scrape_id: str, variant: str) -> Path:
+        return self.root / f"{scrape_id}-{variant}"
+
+    def archive_path(self, scrape_id: str, variant: str = None) -> Path:
+        name = f"{scrape_id}-{variant}" if variant else scrape_id
+        path = self.root / ARCHIVE_SUBDIR / f"{name}.zip"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def scrape_id_for(self, name: str) -> str:
+        """Maps a top-level directory or archive name back to the scrape id that owns it."""
+        if name.endswith('.zip'): name = name[:-4]
+        for variant in VARIANTS:
+            if name.endswith(f"-{variant}"): return name[:-len(variant) - 1]
+        return name
+
+    def resolve_archive(self, filename: str) -> Path | None:
+        """Returns the archive path for a download and records the access, or None if the name escapes the archive directory."""
+        archive_dir = (self.root / ARCHIVE_SUBDIR).resolve()
+        path = (archive_dir / filename).resolve()
+        if path.parent != archive_dir: return None
+        if path.is_file(): self.touch(self.scrape_id_for(path.name))
+        return path
+
+    def resolve_file(self, filepath: str, record_access: bool = False) -> Path | None:
+        """
+        Returns the path of a mirrored file, or None if it escapes the storage root.
+        Only downloads should pass record_access; previews fetch every asset on the page.
+        """
+        root = self.root.resolve()
+        path = (root / filepath).resolve()
+        if path == root or not path.is_relative_to(root): return None
+        top_level = path.relative_to(root).parts[0]
+        if top_level in (INDEX_FILENAME, RESULT_CACHE_FILENAME, LOCK_SUBDIR): return None
+        if record_access and path.is_file(): self.touch(self.scrape_id_for(top_level))
+        return path
+
+    def lock(self, name: str):
+        return file_lock(self.root / LOCK_SUBDIR / f"{name}.lock")
+
+    # --- INDEX ---
+    def _index_path(self) -> Path:
+        return self.root / INDEX_FILENAME
+
+    def _load_index(self) -> dict:
+        try:
+            return json.loads(self._index_path().read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Storage index is unreadable, starting a new one: {e}")
+            return {}
+
+    def _save_index(self, index: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._index_path().with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(index, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self._index_path())
+
+    def _artifact_paths(self, scrape_id: str) -> list:
+        paths = [self.scrape_dir(scrape_id), self.root / ARCHIVE_SUBDIR / f"{scrape_id}.zip"]
+        for variant in VARIANTS:
+            paths.append(self.variant_dir(scrape_id, variant))
+            paths.append(self.root / ARCHIVE_SUBDIR / f"{scrape_id}-{variant}.zip")
+            paths.append(self.root / LOCK_SUBDIR / f"{scrape_id}-{variant}.lock")
+        return paths
+
+    def _measure(self, scrape_id: str) -> int:
+        size = 0
+        for path in self._artifact_paths(scrape_id):
+            if path.is_file():
+                size += path.stat().st_size
+            elif path.is_dir():
+                size += sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+        return size
+
+    def register(self, scrape_id: str):
+        """Records (or re-measures) a scrape after its artifacts were written, then enforces the quota."""
+        size = self._measure(scrape_id)
+        with self.lock("storage_index"):
+            index = self._load_index()
+            entry = index.setdefault(scrape_id, {"created": time.time()})
+            entry["size"] = size
+            entry["last_access"] = time.time()
+            self._evict(index, protect=scrape_id)
+            self._save_index(index)
+
+    def discard(self, scrape_id: str):
+        """Removes a scrape and its artifacts, e.g. after the crawl that was writing it failed."""
+        with self.lock("storage_index"):
+            self._remove_artifacts(scrape_id)
+            index = self._load_index()
+            if index.pop(scrape_id, None) is not None: self._save_index(index)
+
+    def touch(self, scrape_id: str):
+        with self.lock("storage_index"):
+            index = self._load_index()
+            if scrape_id not in index: return
+            index[scrape_id]["last_access"] = time.time()
+            self._save_index(index)
+
+    def total_size(self) -> int:
+        with self.lock("storage_index"):
+            return sum(entry.get("size", 0) for entry in self._load_index().values())
+
+    def _evict(self, index: dict, protect: str = None):
+        total = sum(entry.get("size", 0) for entry in index.values())
+        for scrape_id in sorted(index, key=lambda s: index[s].get("last_access", 0)):
+            if total <= self.quota_bytes: break
+            if scrape_id == protect: continue
+            # Holding every conversion lock keeps a conversion from starting on a tree that is being removed.
+            with ExitStack() as stack:
+                if not all(stack.enter_context(try_file_lock(self.root / LOCK_SUBDIR / f"{scrape_id}-{variant}.lock")) for variant in VARIANTS):
+                    logger.info(f"Scrape {scrape_id} is being converted, skipping it for eviction")
+                    continue
+                logger.info(f"Storage quota exceeded, evicting scrape {scrape_id}")
+                self._remove_artifacts(scrape_id)
+            total -= index.pop(scrape_id).get("size", 0)
+
+    def _remove_artifacts(self, scrape_id: str):
+        for path in self._artifact_paths(scrape_id):
+            if path.is_dir(): shutil.rmtree(path, ignore_errors=True)
+            elif path.is_file(): path.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=None)
+def get_scrape_storage() -> ScrapeStorage:
+    from django.conf import settings
+    return ScrapeStorage(
+        Path(settings.BASE_DIR) / "mirror_upgraded",
+        getattr(settings, 'SCRAPER_STORAGE_QUOTA', DEFAULT_STORAGE_QUOTA),
+    )
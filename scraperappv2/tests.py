@@ -1,3 +1,484 @@
-from django.test import TestCase
+import collections
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from bs4 import BeautifulSoup, Comment
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+
+from . import scraper, storage
+from .dedup import ContentDeduplicator, content_fingerprint
+from .management.commands import mirror_batch
+from .render_mode import RenderModeAdvisor, RENDER_STATIC, RENDER_DYNAMIC, RENDER_MODE_REVALIDATE_EVERY
+from .result_cache import ScrapeResultCache
+
+
+class ChunkHtmlTests(SimpleTestCase):
+    def test_split_keeps_entities_and_comments_intact(self):
+        page = '<div class="wrap">' + 'a &lt;b&gt; c <!-- note --> <br/>' * 600 + '</div>'
+        chunks = scraper.chunk_html(page, 500)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertTrue(chunk.startswith('<div class="wrap">'))
+            soup = BeautifulSoup(chunk, "html.parser")
+            self.assertIsNone(soup.find("b"))
+            self.assertNotIn("note", soup.get_text())
+            self.assertIn("a <b> c", soup.get_text())
+        comments = [c for chunk in chunks for c in BeautifulSoup(chunk, "html.parser").find_all(string=lambda s: isinstance(s, Comment))]
+        self.assertEqual(len(comments), 600)
+
+
+class ConvertHtmlSnippetTests(SimpleTestCase):
+    def fake_component(self, html_snippet, css_content, component_name):
+        return {"react_component": (
+            f"const {component_name} = () => {{\n"
+            f"  const [open, setOpen] = useState(false);\n"
+            f"  return (<div onClick={{() => setOpen(!open)}}>{component_name}</div>);\n"
+            f"}};"
+        )}
+
+    def test_chunks_are_stitched_as_part_components(self):
+        page = "<body>" + "".join(f"<section>{'<p>lorem ipsum</p>' * 300}</section>" for _ in range(3)) + "</body>"
+        with mock.patch.object(scraper, "request_react_component", side_effect=self.fake_component):
+            result = scraper.convert_html_snippet_to_component(page, "", "HomePage", token_budget=4000)
+
+        code = result["react_component"]
+        self.assertTrue(result["stitched"])
+        self.assertIn("const HomePagePart1 = () => {", code)
+        self.assertIn("const [open, setOpen] = useState(false);", code)
+        self.assertLess(code.index("<HomePagePart1 />"), code.index("<HomePagePart2 />"))
+
+        module = scraper.build_component_module(result, "HomePage", fragment=True)
+        self.assertIn("import React, { useState } from 'react';", module)
+        self.assertTrue(module.rstrip().endswith("export default HomePage;"))
+
+    def test_small_snippet_is_converted_in_one_request(self):
+        with mock.patch.object(scraper, "request_react_component", side_effect=self.fake_component) as request:
+            result = scraper.convert_html_snippet_to_component("<header>Hi</header>", "", "Header")
+        request.assert_called_once()
+        self.assertNotIn("stitched", result)
+
+    def large_css(self, *used_rules: str) -> str:
+        unused = "".join(f".unused{i} {{ color: red; margin: {i}px; }}\n" for i in range(8000))
+        return unused + "\n".join(used_rules)
+
+    def test_large_css_is_trimmed_instead_of_splitting_the_page(self):
+        css = self.large_css(
+            "/* hero */ .hero h1, .missing { font-size: 3rem; }",
+            "h1 { margin: 0; }",
+            "@media (max-width: 600px) { .hero { padding: 0; } .unused1 { color: blue; } }",
+            "@font-face { font-family: Brand; src: url(brand.woff2); }",
+        )
+        self.assertGreater(scraper.estimate_tokens(css), 60000)
+        with mock.patch.object(scraper, "request_react_component", side_effect=self.fake_component) as request:
+            scraper.convert_html_snippet_to_component('<section class="hero"><h1>Hi</h1></section>', css, "Hero")
+
+        request.assert_called_once()
+        sent_css = request.call_args.args[1]
+        self.assertEqual(sent_css, (
+            ".hero h1, .missing { font-size: 3rem; }\n"
+            "h1 { margin: 0; }\n"
+            "@media (max-width: 600px) {\n.hero { padding: 0; }\n}\n"
+            "@font-face { font-family: Brand; src: url(brand.woff2); }"
+        ))
+
+    def test_each_chunk_gets_the_css_it_uses(self):
+        page = "<body>" + "".join(f"<section class='sec{n}'>{'<p>lorem ipsum</p>' * 300}</section>" for n in range(3)) + "</body>"
+        css = self.large_css(*(f".sec{n} p {{ color: #00{n}; }}" for n in range(3)))
+        with mock.patch.object(scraper, "request_react_component", side_effect=self.fake_component) as request:
+            scraper.convert_html_snippet_to_component(page, css, "HomePage", token_budget=4000)
+
+        self.assertEqual(request.call_count, 3)
+        for n, sent in enumerate(sorted(request.call_args_list, key=lambda c: c.args[2])):
+            self.assertEqual(sent.args[1], f".sec{n} p {{ color: #00{n}; }}")
+
+
+class ContentDeduplicatorTests(SimpleTestCase):
+    def words(self, prefix: str, count: int) -> list:
+        return [f"{prefix}{i}" for i in range(count)]
+
+    def test_exact_duplicate_ignores_whitespace_and_punctuation(self):
+        dedup = ContentDeduplicator()
+        self.assertIsNone(dedup.check("http://a/one", content_fingerprint("Hello,   world. Same page!")))
+        self.assertEqual(dedup.check("http://a/two", content_fingerprint("hello world same page")), "http://a/one")
+        self.assertEqual(dedup.aliases, {"http://a/two": "http://a/one"})
+
+    def test_near_duplicate_is_collapsed(self):
+        dedup = ContentDeduplicator()
+        words = self.words("word", 400)
+        self.assertIsNone(dedup.check("http://a/page", content_fingerprint(" ".join(words))))
+        printable = " ".join(words[:-1] + ["print"])
+        self.assertEqual(dedup.check("http://a/page?print=1", content_fingerprint(printable)), "http://a/page")
+
+    def test_distinct_pages_are_kept(self):
+        dedup = ContentDeduplicator()
+        self.assertIsNone(dedup.check("http://a/one", content_fingerprint(" ".join(self.words("alpha", 200)))))
+        self.assertIsNone(dedup.check("http://a/two", content_fingerprint(" ".join(self.words("beta", 200)))))
+        self.assertIsNone(dedup.check("http://a/empty", content_fingerprint("")))
+        self.assertIsNone(dedup.check("http://a/empty2", content_fingerprint("")))
+
+    def test_shared_boilerplate_does_not_make_pages_duplicates(self):
+        nav = "<nav>" + " ".join(self.words("menu", 1500)) + "</nav>"
+        dedup = ContentDeduplicator()
+        for page in range(20):
+            body = " ".join(self.words(f"p{page}x", 60))
+            html = f"<html><body>{nav}<header>Site</header><div>{body}</div><footer>Footer</footer></body></html>".encode()
+            fingerprint = scraper.parse_page_content(html, f"http://a/{page}", 1, 1, "http://a", Path("/tmp"))[5]
+            self.assertIsNone(dedup.check(f"http://a/{page}", fingerprint))
+
+
+class RenderModeAdvisorTests(SimpleTestCase):
+    def record(self, advisor, url: str, *outcomes):
+        for needs_js in outcomes:
+            advisor.record(url, needs_js=needs_js)
+
+    def test_decision_needs_minimum_samples(self):
+        advisor = RenderModeAdvisor()
+        self.record(advisor, "http://a/blog/1/post", False, False)
+        self.assertIsNone(advisor.choose("http://a/blog/2/post"))
+        self.record(advisor, "http://a/blog/3/post", False)
+        self.assertEqual(advisor.choose("http://a/blog/4/post"), RENDER_STATIC)
+
+    def test_decision_needs_agreement(self):
+        advisor = RenderModeAdvisor()
+        self.record(advisor, "http://a/app/x", False, True, True)
+        self.assertIsNone(advisor.choose("http://a/app/y"))
+        self.record(advisor, "http://a/app/x", True, True)
+        self.assertEqual(advisor.choose("http://a/app/y"), RENDER_DYNAMIC)
+
+    def test_unseen_pattern_follows_host(self):
+        advisor = RenderModeAdvisor()
+        self.record(advisor, "http://a/app/x", True, True, True)
+        self.assertEqual(advisor.choose("http://a/docs/intro/page"), RENDER_DYNAMIC)
+        self.assertIsNone(advisor.choose("http://b/app/x"))
+
+    def test_every_nth_routed_page_is_probed_again(self):
+        advisor = RenderModeAdvisor()
+        self.record(advisor, "http://a/app/x", False, False, False)
+        choices = [advisor.choose("http://a/app/y") for _ in range(RENDER_MODE_REVALIDATE_EVERY)]
+        self.assertEqual(choices[:-1], [RENDER_STATIC] * (RENDER_MODE_REVALIDATE_EVERY - 1))
+        self.assertIsNone(choices[-1])
+
+    def test_disagreeing_probe_resets_the_decision(self):
+        advisor = RenderModeAdvisor()
+        self.record(advisor, "http://a/app/x", False, False, False, True)
+        self.assertIsNone(advisor.choose("http://a/app/y"))
+        self.assertEqual(advisor.snapshot()["a/app"], {"static": 0, "dynamic": 1, "routed": 0, "decision": None})
+
+    def scrape(self, advisor, url: str, static_html: bytes | None, dynamic_html: str | None):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        static = (static_html, 'text/html') if static_html else (None, '')
+        with mock.patch.object(scraper, "fetch_static", return_value=static), \
+                mock.patch.object(scraper, "fetch_with_selenium", return_value=dynamic_html), \
+                ThreadPoolExecutor(max_workers=1) as pool:
+            scraper.scrape_page(url, 0, "http://a", root, None, mock.Mock(), set(), set(), set(), pool, render_advisor=advisor)
+
+    def test_failed_fetches_are_not_samples(self):
+        advisor = RenderModeAdvisor()
+        for page in range(5):
+            self.scrape(advisor, f"http://a/blog/{page}", None, None)
+        self.assertEqual(advisor.snapshot(), {})
+
+    def test_sparse_page_counts_as_dynamic_only_when_rendering_adds_text(self):
+        advisor = RenderModeAdvisor()
+        sparse = b"<html><body><p>short</p></body></html>"
+        self.scrape(advisor, "http://a/blog/1", sparse, sparse.decode())
+        self.scrape(advisor, "http://a/blog/2", sparse, "<html><body><p>" + "rendered " * 100 + "</p></body></html>")
+        stats = advisor.snapshot()["a/blog"]
+        self.assertEqual((stats["static"], stats["dynamic"]), (1, 1))
+
+
+class MirrorBatchCommandTests(SimpleTestCase):
+    def test_limits_below_one_are_rejected(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("http://example.com/\n")
+        for option in ("sites", "workers", "per_host", "parse_workers"):
+            with self.subTest(option=option), mock.patch.object(mirror_batch.Command, "mirror_site") as mirror_site:
+                with self.assertRaisesMessage(CommandError, "must be at least 1"):
+                    call_command("mirror_batch", f.name, **{option: 0})
+                mirror_site.assert_not_called()
+        os.unlink(f.name)
+
+    def run_batch(self, urls: list, **options) -> list:
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("\n".join(urls))
+        self.addCleanup(os.unlink, f.name)
+        out = io.StringIO()
+        call_command("mirror_batch", f.name, stdout=out, **options)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def track_concurrency(self):
+        lock, active, shares, peaks = threading.Lock(), collections.Counter(), [], collections.Counter()
+        def mirror_site(url, workers, parse_pool, options):
+            host = url.split("/")[2]
+            with lock:
+                active[host] += 1
+                shares.append(workers)
+                peaks[host] = max(peaks[host], active[host])
+                peaks["workers"] = max(peaks["workers"], sum(shares))
+            time.sleep(0.05)
+            with lock:
+                active[host] -= 1
+                shares.remove(workers)
+            return {"url": url, "status": "ok", "workers": workers}
+        return mirror_site, peaks
+
+    def test_per_host_limit_and_worker_budget(self):
+        mirror_site, peaks = self.track_concurrency()
+        urls = ["http://a.test/1", "http://a.test/2", "http://a.test/3", "http://b.test/1"]
+        with mock.patch.object(mirror_batch.Command, "mirror_site", side_effect=mirror_site):
+            records = self.run_batch(urls, sites=4, workers=8, per_host=1)
+
+        self.assertEqual(sorted(r["url"] for r in records), sorted(urls))
+        self.assertEqual((peaks["a.test"], peaks["b.test"]), (1, 1))
+        self.assertLessEqual(peaks["workers"], 8)
+        # Once b.test is done only a.test is left, and one site at a time gets the whole budget.
+        self.assertEqual(next(r for r in records if r["url"] == "http://a.test/3")["workers"], 8)
+
+    def test_sites_are_limited_to_the_worker_budget(self):
+        mirror_site, peaks = self.track_concurrency()
+        urls = [f"http://host{i}.test/" for i in range(4)]
+        with mock.patch.object(mirror_batch.Command, "mirror_site", side_effect=mirror_site):
+            records = self.run_batch(urls, sites=4, workers=2)
+        self.assertEqual({r["workers"] for r in records}, {1})
+        self.assertEqual(peaks["workers"], 2)
+
+    def test_records_are_json_lines(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        def scrape(url, metrics, storage, **kwargs):
+            metrics.update({
+                "scrape_id": "a.test_1", "pages": 2, "assets": 1, "files": 3, "bytes": 300, "archive_bytes": 120,
+                "render_modes": {}, "duplicate_pages": 0, "timings": {"crawl": 0.5, "assets": 0.1, "total": 0.7},
+            })
+            return ([{"name": "index.html", "path": "a.test_1/html/index.html"}] if "a.test" in url else []), str(root / "a.test_1.zip")
+
+        with mock.patch.object(mirror_batch, "get_scrape_storage", return_value=storage.ScrapeStorage(root)), \
+                mock.patch.object(mirror_batch, "run_scrape_workflow", side_effect=scrape):
+            records = {r["url"]: r for r in self.run_batch(["http://a.test/", "http://b.test/", "ftp://c.test/"])}
+
+        self.assertEqual(records["http://a.test/"], {
+            "url": "http://a.test/", "status": "ok", "scrape_id": "a.test_1", "pages": 2, "assets": 1, "files": 3,
+            "bytes": 300, "archive_bytes": 120, "render_modes": {}, "duplicate_pages": 0,
+            "archive": str(root / "a.test_1.zip"), "timings": {"crawl": 0.5, "assets": 0.1, "total": mock.ANY},
+        })
+        self.assertEqual(records["http://b.test/"]["status"], "empty")
+        self.assertEqual(records["ftp://c.test/"], {
+            "url": "ftp://c.test/", "status": "error", "error": "URL must start with http:// or https://", "timings": {},
+        })
+
+
+class ScrapeStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        clock = itertools.count(1000)
+        patcher = mock.patch.object(storage.time, "time", side_effect=lambda: next(clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_scrape(self, store, scrape_id: str, size: int):
+        page = store.scrape_dir(scrape_id) / "html" / "index.html"
+        page.parent.mkdir(parents=True)
+        page.write_bytes(b"x" * size)
+        store.register(scrape_id)
+
+    def test_least_recently_downloaded_scrape_is_evicted_first(self):
+        store = storage.ScrapeStorage(self.root, quota_bytes=300)
+        for scrape_id in ("a", "b", "c"):
+            self.add_scrape(store, scrape_id, 100)
+        store.resolve_file("a/html/index.html", record_access=True)
+
+        self.add_scrape(store, "d", 100)
+
+        self.assertFalse(store.scrape_dir("b").exists())
+        self.assertTrue(all(store.scrape_dir(s).exists() for s in ("a", "c", "d")))
+        self.assertEqual(store.total_size(), 300)
+
+    def test_previews_do_not_count_as_access(self):
+        store = storage.ScrapeStorage(self.root, quota_bytes=200)
+        self.add_scrape(store, "a", 100)
+        self.add_scrape(store, "b", 100)
+        store.resolve_file("a/html/index.html")
+
+        self.add_scrape(store, "c", 100)
+
+        self.assertFalse(store.scrape_dir("a").exists())
+        self.assertTrue(store.scrape_dir("b").exists())
+
+    def test_newly_registered_scrape_is_protected(self):
+        store = storage.ScrapeStorage(self.root, quota_bytes=150)
+        self.add_scrape(store, "a", 100)
+        self.add_scrape(store, "big", 500)
+
+        self.assertFalse(store.scrape_dir("a").exists())
+        self.assertTrue(store.scrape_dir("big").exists())
+
+    def test_scrape_under_conversion_is_not_evicted(self):
+        store = storage.ScrapeStorage(self.root, quota_bytes=200)
+        self.add_scrape(store, "a", 100)
+        self.add_scrape(store, "b", 100)
+        with store.lock("a-react-pro"):
+            self.add_scrape(store, "c", 100)
+        self.assertTrue(store.scrape_dir("a").exists())
+        self.assertFalse(store.scrape_dir("b").exists())
+
+        self.add_scrape(store, "d", 100)
+        self.assertFalse(store.scrape_dir("a").exists())
+
+    def test_converting_an_evicted_scrape_fails_without_registering_it(self):
+        store = storage.ScrapeStorage(self.root)
+        with self.assertRaises(FileNotFoundError):
+            scraper.run_tailwind_conversion(str(store.scrape_dir("gone")), store)
+        self.assertEqual(store._load_index(), {})
+
+    def test_failed_crawl_removes_the_partial_scrape(self):
+        store = storage.ScrapeStorage(self.root)
+        def fail(url, depth, base_url, root_dir, *args):
+            (root_dir / "html").mkdir()
+            raise RuntimeError("crawl failed")
+
+        with mock.patch.object(scraper, "setup_selenium_driver", return_value=None), \
+                mock.patch.object(scraper, "scrape_page", side_effect=fail), \
+                ThreadPoolExecutor(max_workers=1) as pool, self.assertRaisesMessage(RuntimeError, "crawl failed"):
+            scraper.run_scrape_workflow("http://a.test", storage=store, parse_pool=pool)
+
+        self.assertEqual([p.name for p in self.root.iterdir()], [storage.LOCK_SUBDIR])
+
+    def test_paths_outside_scrapes_are_refused(self):
+        store = storage.ScrapeStorage(self.root)
+        self.add_scrape(store, "a", 10)
+        self.assertIsNone(store.resolve_file("../etc/passwd"))
+        self.assertIsNone(store.resolve_file(storage.INDEX_FILENAME))
+        self.assertIsNone(store.resolve_archive("../a.zip"))
+
+
+class ParsePoolTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(self.reset_shared_pool)
+        self.reset_shared_pool()
+
+    def reset_shared_pool(self):
+        if scraper.shared_parse_pool: scraper.shared_parse_pool.shutdown(cancel_futures=True)
+        scraper.shared_parse_pool = None
+
+    @override_settings(SCRAPER_PARSE_WORKERS=2)
+    def test_pool_is_shared_and_sized_from_settings(self):
+        pool = scraper.get_parse_pool()
+        self.assertIs(scraper.get_parse_pool(), pool)
+        self.assertEqual(pool._max_workers, 2)
+
+    @override_settings(SCRAPER_PARSE_WORKERS=1)
+    def test_broken_pool_is_replaced(self):
+        pool = scraper.get_parse_pool()
+        with self.assertRaises(BrokenProcessPool):
+            pool.submit(os._exit, 1).result()
+
+        replacement = scraper.get_parse_pool()
+        self.assertIsNot(replacement, pool)
+        self.assertEqual(replacement.submit(len, "abc").result(), 3)
+
+    def test_scrape_page_parses_in_a_spawned_pool(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        page = (
+            b'<html><head><link rel="stylesheet" href="/css/site.css"></head><body>'
+            b'<a href="/docs/intro">Intro</a><a href="http://other.example/">Away</a>'
+            b'<img src="/img/logo.png"></body></html>'
+        )
+        responses = {
+            "http://a.test/": (page, "text/html"),
+            "http://a.test/css/site.css": (b"body { background: url(../img/bg.png); }", "text/css"),
+        }
+        to_crawl, assets = set(), set()
+        with mock.patch.object(scraper, "fetch_static", side_effect=lambda session, url, driver: responses[url]), scraper.create_parse_pool(1) as pool:
+            scraper.scrape_page("http://a.test/", 0, "http://a.test/", root, None, None, to_crawl, set(), assets, pool)
+
+        self.assertEqual(to_crawl, {"http://a.test/docs/intro"})
+        self.assertEqual({asset_url for asset_url, _ in assets}, {"http://a.test/css/site.css", "http://a.test/img/logo.png", "http://a.test/img/bg.png"})
+        saved = scraper.get_local_path("http://a.test/", root, "html").read_text()
+        self.assertIn('href="../../css/a.test/css/site.css"', saved)
+        self.assertIn('src="../../images/a.test/img/logo.png"', saved)
+        self.assertIn('href="http://other.example/"', saved)
+
+
+class ScrapeResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.store = storage.ScrapeStorage(Path(tempfile.mkdtemp()))
+        self.addCleanup(shutil.rmtree, self.store.root, ignore_errors=True)
+        self.archive = self.store.archive_path("site_1")
+        self.archive.write_bytes(b"zip")
+
+    def test_fresh_result_is_reused_for_equivalent_url(self):
+        cache = ScrapeResultCache(self.store, ttl_seconds=60)
+        scrape = mock.Mock(return_value=([{"path": "a/index.html"}], str(self.archive)))
+        self.assertFalse(cache.get_or_scrape("http://Example.com/", {"depth": 1}, scrape)[2])
+        self.assertTrue(cache.get_or_scrape("http://example.com", {"depth": 1}, scrape)[2])
+        self.assertFalse(cache.get_or_scrape("http://example.com", {"depth": 1}, scrape, force_refresh=True)[2])
+        self.assertEqual(scrape.call_count, 2)
+
+    def test_empty_result_is_not_cached(self):
+        cache = ScrapeResultCache(self.store, ttl_seconds=60)
+        scrape = mock.Mock(return_value=([], str(self.archive)))
+        cache.get_or_scrape("http://example.com", {"depth": 1}, scrape)
+        self.assertFalse(cache.get_or_scrape("http://example.com", {"depth": 1}, scrape)[2])
+        self.assertEqual(scrape.call_count, 2)
+
+    def test_results_are_shared_between_processes(self):
+        scrape = mock.Mock(return_value=([{"path": "a/index.html"}], str(self.archive)))
+        ScrapeResultCache(self.store, ttl_seconds=60).get_or_scrape("http://example.com", {"depth": 1}, scrape)
+        other_worker = ScrapeResultCache(storage.ScrapeStorage(self.store.root), ttl_seconds=60)
+        self.assertEqual(other_worker.get_or_scrape("http://example.com", {"depth": 1}, scrape), ([{"path": "a/index.html"}], str(self.archive), True))
+        scrape.assert_called_once()
+
+    def test_concurrent_identical_requests_wait_on_one_scrape(self):
+        cache = ScrapeResultCache(self.store, ttl_seconds=60)
+        def slow_scrape():
+            time.sleep(0.1)
+            return [{"path": "a/index.html"}], str(self.archive)
+        scrape = mock.Mock(side_effect=slow_scrape)
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: cache.get_or_scrape("http://example.com", {"depth": 1}, scrape), range(5)))
+
+        scrape.assert_called_once()
+        self.assertEqual(sorted(reused for _, _, reused in results), [False, True, True, True, True])
+
+
+class ConversionLockTests(SimpleTestCase):
+    def test_concurrent_conversions_of_one_scrape_are_serialized(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        store = storage.ScrapeStorage(root)
+        css = store.scrape_dir("site_1") / "css" / "style.css"
+        css.parent.mkdir(parents=True)
+        css.write_text("body { color: red; }")
+
+        active, overlaps = [0], []
+        def convert(css_content):
+            active[0] += 1
+            overlaps.append(active[0])
+            time.sleep(0.05)
+            active[0] -= 1
+            return {"tailwind_classes": "text-red-500"}
+
+        with mock.patch.object(scraper, "convert_css_to_tailwind", side_effect=convert):
+            threads = [threading.Thread(target=scraper.run_tailwind_conversion, args=(str(store.scrape_dir("site_1")), store)) for _ in range(3)]
+            for thread in threads: thread.start()
+            for thread in threads: thread.join()
+
+        self.assertEqual(overlaps, [1, 1, 1])
+        self.assertTrue(store.archive_path("site_1", "tailwind").is_file())
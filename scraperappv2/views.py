@@ -13,27 +13,35 @@ from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 
 # Import the correct functions from your provided scraper file
-from .scraper import run_scrape_workflow, run_react_conversion_workflow, run_tailwind_conversion
+from .scraper import run_scrape_workflow, run_react_conversion_workflow, run_tailwind_conversion, get_parse_pool, AI_CHUNK_TOKEN_BUDGET, DEFAULT_MAX_DEPTH, DEFAULT_MAX_WORKERS, DEFAULT_USER_AGENT
+from .storage import get_scrape_storage
+from .result_cache import get_result_cache
 
 logger = logging.getLogger(__name__)
 
 def index(request: HttpRequest) -> HttpResponse:
     """
-    Handles the main page logic. A POST request starts a new scrape,
-    while a GET request clears the session for a fresh start.
+    Handles the main page logic. A POST request starts a new scrape (or reuses a recent
+    one for the same URL unless "force refresh" is ticked), while a GET request clears
+    the session for a fresh start.
     """
     if request.method == "GET" and 'scrape_dir' in request.session:
         del request.session['scrape_dir']
         
     if request.method == "POST":
         url = request.POST.get("url", "").strip()
+        force_refresh = request.POST.get("force_refresh") == "on"
         if not url.startswith(('http://', 'https://')):
             messages.error(request, "Invalid URL. Please ensure it starts with http:// or https://")
             return render(request, "scraperappv2/index.html")
         
         try:
             # FIX: Get correct return values from scraper
-            file_list, zip_path = run_scrape_workflow(url)
+            storage = get_scrape_storage()
+            options = {"depth": DEFAULT_MAX_DEPTH, "workers": DEFAULT_MAX_WORKERS, "user_agent": DEFAULT_USER_AGENT}
+            file_list, zip_path, reused = get_result_cache().get_or_scrape(
+                url, options, lambda: run_scrape_workflow(url, storage=storage, parse_pool=get_parse_pool(), **options), force_refresh=force_refresh
+            )
             
             # Extract directory from first file path
             if file_list:
@@ -43,7 +51,9 @@ def index(request: HttpRequest) -> HttpResponse:
                 # We need the full path to the unique scrape folder.
                 first_file_rel_path = Path(file_list[0]['path'])
                 scrape_dir_name = first_file_rel_path.parts[0]
-                scrape_dir_full_path = Path(settings.BASE_DIR) / "mirror_upgraded" / scrape_dir_name
+                scrape_dir_full_path = storage.scrape_dir(scrape_dir_name)
+                # A scrape loaded from the cache is in use again, so it should not be the next one evicted.
+                if reused: storage.touch(scrape_dir_name)
                 
                 # Store the unique output directory in the session
                 request.session['scrape_dir'] = str(scrape_dir_full_path)
@@ -62,7 +72,9 @@ def index(request: HttpRequest) -> HttpResponse:
                 "scrape_session_active": bool(file_list) # Flag to show conversion buttons
             }
             
-            if file_list:
+            if file_list and reused:
+                messages.success(request, f"Loaded {len(file_list)} files from a recent scrape of this URL. Tick \"Force refresh\" to scrape it again.")
+            elif file_list:
                 messages.success(request, f"Successfully scraped {len(file_list)} files. You can now perform AI conversions.")
             else:
                 messages.warning(request, "Scrape completed but no files were found.")
@@ -92,9 +104,9 @@ def trigger_conversion(request: HttpRequest) -> JsonResponse:
             return JsonResponse({'error': 'No active scrape session found. Please scrape a site first.'}, status=400)
 
         if conversion_type == 'react':
-            new_zip_path_str = run_react_conversion_workflow(source_dir)
+            new_zip_path_str = run_react_conversion_workflow(source_dir, storage=get_scrape_storage(), token_budget=getattr(settings, 'SCRAPER_AI_TOKEN_BUDGET', AI_CHUNK_TOKEN_BUDGET))
         elif conversion_type == 'tailwind':
-             new_zip_path_str = run_tailwind_conversion(source_dir)
+             new_zip_path_str = run_tailwind_conversion(source_dir, storage=get_scrape_storage())
         else:
             return JsonResponse({'error': 'Invalid conversion type.'}, status=400)
         
@@ -115,12 +127,11 @@ def trigger_conversion(request: HttpRequest) -> JsonResponse:
 # --- File Serving Views ---
 
 def serve_mirrored_file(request: HttpRequest, filepath: str) -> HttpResponse:
-    # Use the base 'mirror_upgraded' directory for security checks
-    base_path = (Path(settings.BASE_DIR) / "mirror_upgraded").resolve()
-    file_path = (base_path / filepath).resolve()
+    # The storage manager confines paths to 'mirror_upgraded'
+    file_path = get_scrape_storage().resolve_file(filepath)
 
     # Security check
-    if not str(file_path).startswith(str(base_path)):
+    if file_path is None:
         return HttpResponseForbidden("Access Denied.")
     if not file_path.exists() or not file_path.is_file():
         raise Http404(f"File not found: {filepath}")
@@ -130,11 +141,10 @@ def serve_mirrored_file(request: HttpRequest, filepath: str) -> HttpResponse:
 
 
 def download_file(request: HttpRequest, filepath: str) -> HttpResponse:
-    base_path = (Path(settings.BASE_DIR) / "mirror_upgraded").resolve()
-    file_path = (base_path / filepath).resolve()
+    file_path = get_scrape_storage().resolve_file(filepath, record_access=True)
 
     # Security check
-    if not str(file_path).startswith(str(base_path)):
+    if file_path is None:
         return HttpResponseForbidden("Access Denied.")
     if not file_path.exists() or not file_path.is_file():
         raise Http404(f"File not found: {filepath}")
@@ -147,11 +157,11 @@ def download_zip(request: HttpRequest, filename: str) -> HttpResponse:
     if not filename.endswith('.zip') or '..' in filename or '/' in filename:
         return HttpResponseForbidden("Invalid filename")
     
-    # --- THIS IS THE ONLY CHANGE: Look for the zip file in the project's root directory ---
-    zip_path = (Path(settings.BASE_DIR) / filename).resolve()
+    # Archives are namespaced by scrape id inside the storage manager's archive directory
+    zip_path = get_scrape_storage().resolve_archive(filename)
     
-    # Security check to ensure the file is in the project root
-    if not str(zip_path.parent) == str(Path(settings.BASE_DIR).resolve()):
+    # Security check to ensure the file is in the archive directory
+    if zip_path is None:
          return HttpResponseForbidden("Access Denied.")
 
     if not zip_path.exists() or not zip_path.is_file():
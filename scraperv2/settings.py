@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -120,6 +121,26 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Scraper storage
+# Once mirror_upgraded grows past this many bytes, the least recently downloaded scrapes are evicted.
+
+SCRAPER_STORAGE_QUOTA = 5 * 1024 ** 3
+
+# Repeat submissions of the same URL within this many seconds reuse the previous scrape.
+# Results are kept in mirror_upgraded, so all server processes share them.
+
+SCRAPER_RESULT_CACHE_TTL = 15 * 60
+
+# Size of the process pool that parses and rewrites pages, shared by all scrapes in this server process.
+# Parsing is CPU-bound, so one worker per core; lower it when several server processes share the machine.
+
+SCRAPER_PARSE_WORKERS = os.cpu_count() or 1
+
+# Tokens per AI prompt for the React conversion. Larger pages are split into parts converted in parallel,
+# and a quarter of the budget is left for the page's CSS, trimmed to the rules each part uses.
+
+SCRAPER_AI_TOKEN_BUDGET = 12000
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 